@@ -7,16 +7,25 @@ with proper timestamps and EXIF data.
 """
 
 import argparse
+import io
+import math
 import os
 import re
 import sys
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import piexif
 from PIL import Image, ExifTags
 
+# Filename date patterns, from most to least specific
+_FULL_DATE_RE = re.compile(r'(\d{4})[.-](\d{1,2})[.-](\d{1,2})')
+_YM_RE = re.compile(r'(\d{4})[.-](\d{1,2})(?![.-]\d)')  # Negative lookahead to avoid matching full dates
+_Y_RE = re.compile(r'(\d{4})(?![.-]\d)')  # Negative lookahead to avoid matching year-month or full dates
+
 
 def parse_date_from_filename(filename: str) -> Optional[datetime]:
     """
@@ -33,8 +42,7 @@ def parse_date_from_filename(filename: str) -> Optional[datetime]:
     name_without_ext = Path(filename).stem
     
     # Try full date pattern first (most specific)
-    full_date_pattern = r'(\d{4})[.-](\d{1,2})[.-](\d{1,2})'
-    match = re.search(full_date_pattern, name_without_ext)
+    match = _FULL_DATE_RE.search(name_without_ext)
     if match:
         year, month, day = map(int, match.groups())
         if 1900 <= year <= 2100 and 1 <= month <= 12 and 1 <= day <= 31:
@@ -48,8 +56,7 @@ def parse_date_from_filename(filename: str) -> Optional[datetime]:
             return None
     
     # Try year-month pattern (only if no full date pattern was found)
-    year_month_pattern = r'(\d{4})[.-](\d{1,2})(?![.-]\d)'  # Negative lookahead to avoid matching full dates
-    match = re.search(year_month_pattern, name_without_ext)
+    match = _YM_RE.search(name_without_ext)
     if match:
         year, month = map(int, match.groups())
         if 1900 <= year <= 2100 and 1 <= month <= 12:
@@ -61,8 +68,7 @@ def parse_date_from_filename(filename: str) -> Optional[datetime]:
             return None
     
     # Try year-only pattern (only if no year-month pattern was found)
-    year_pattern = r'(\d{4})(?![.-]\d)'  # Negative lookahead to avoid matching year-month or full dates
-    match = re.search(year_pattern, name_without_ext)
+    match = _Y_RE.search(name_without_ext)
     if match:
         year = int(match.group(1))
         if 1900 <= year <= 2100:
@@ -99,23 +105,21 @@ def resize_image(image: Image.Image, max_dimension: int) -> Image.Image:
         new_height = max_dimension
         new_width = int((width * max_dimension) / height)
     
-    return image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    # reducing_gap lets Pillow shrink large images with a cheap box reduction
+    # before the final LANCZOS pass
+    return image.resize((new_width, new_height), Image.Resampling.LANCZOS, reducing_gap=2.0)
 
 
-def create_exif_with_date(date_taken: datetime) -> bytes:
+def _build_exif_bytes(date_str: str) -> bytes:
     """
-    Create EXIF data with the specified date.
+    Build EXIF data for a formatted date using piexif.
     
     Args:
-        date_taken: datetime object for the photo date
+        date_str: Date in EXIF format (YYYY:MM:DD HH:MM:SS)
         
     Returns:
         EXIF data as bytes
     """
-    # Format date for EXIF (YYYY:MM:DD HH:MM:SS)
-    date_str = date_taken.strftime("%Y:%m:%d %H:%M:%S")
-    
-    # Create EXIF dictionary
     exif_dict = {
         "0th": {
             piexif.ImageIFD.DateTime: date_str,
@@ -130,134 +134,240 @@ def create_exif_with_date(date_taken: datetime) -> bytes:
     return piexif.dump(exif_dict)
 
 
+def _build_exif_template() -> Tuple[bytes, Tuple[int, ...]]:
+    """
+    Build EXIF data with a placeholder date and locate the date fields in it.
+    
+    Every file gets the same EXIF structure with only the date changing, so
+    create_exif_with_date copies this template and overwrites the dates in place.
+    
+    Returns:
+        Tuple of (template bytes, offsets of the three date fields)
+    """
+    placeholder = b"0000:00:00 00:00:00"
+    template = _build_exif_bytes(placeholder.decode("ascii"))
+    
+    offsets = []
+    offset = template.find(placeholder)
+    while offset != -1:
+        offsets.append(offset)
+        offset = template.find(placeholder, offset + len(placeholder))
+    
+    if len(offsets) != 3:
+        raise RuntimeError(f"Expected 3 date fields in EXIF template, found {len(offsets)}")
+    
+    return template, tuple(offsets)
+
+
+_EXIF_TEMPLATE, _EXIF_DATE_OFFSETS = _build_exif_template()
+
+
+def create_exif_with_date(date_taken: datetime) -> bytes:
+    """
+    Create EXIF data with the specified date.
+    
+    Args:
+        date_taken: datetime object for the photo date
+        
+    Returns:
+        EXIF data as bytes
+    """
+    # Format date for EXIF (YYYY:MM:DD HH:MM:SS)
+    date_str = date_taken.strftime("%Y:%m:%d %H:%M:%S")
+    if len(date_str) != 19:
+        # Years before 1000 may not be zero-padded, so the template won't fit
+        return _build_exif_bytes(date_str)
+    
+    date_bytes = date_str.encode("ascii")
+    exif = bytearray(_EXIF_TEMPLATE)
+    for offset in _EXIF_DATE_OFFSETS:
+        exif[offset:offset + 19] = date_bytes
+    
+    return bytes(exif)
+
+
+def timestamp_ns(date_time: datetime) -> int:
+    """
+    Convert a datetime to a nanosecond timestamp.
+    
+    Args:
+        date_time: datetime to convert
+        
+    Returns:
+        Nanoseconds since the epoch
+    """
+    # Whole seconds plus microseconds, so no precision is lost converting a float to nanoseconds
+    return math.floor(date_time.timestamp()) * 1_000_000_000 + date_time.microsecond * 1000
+
+
 def set_file_timestamps(file_path: Path, date_time: datetime):
     """
-    Set the creation and modification timestamps of a file.
+    Set the access and modification timestamps of a file.
     
     Args:
         file_path: Path to the file
         date_time: datetime to set as timestamps
     """
-    timestamp = date_time.timestamp()
+    file_timestamp_ns = timestamp_ns(date_time)
     
     # Set modification and access times
-    os.utime(file_path, (timestamp, timestamp))
+    os.utime(file_path, ns=(file_timestamp_ns, file_timestamp_ns))
+
+
+def set_creation_times(files: List[Tuple[Path, datetime]], chunk_size: int = 500):
+    """
+    Set the creation times of files on macOS using SetFile.
+    
+    Files sharing a date are passed to a single SetFile call (in chunks to stay
+    under the command line length limit), so the tool is run once per distinct
+    date rather than once per file.
     
-    # On macOS, also try to set creation time
-    if sys.platform == "darwin":
-        try:
-            import subprocess
-            date_str = date_time.strftime("%m/%d/%Y %H:%M:%S")
-            subprocess.run([
-                "SetFile", "-d", date_str, "-m", date_str, str(file_path)
-            ], check=False, capture_output=True)
-        except (FileNotFoundError, subprocess.SubprocessError):
-            # SetFile not available, skip creation time setting
-            pass
+    Args:
+        files: (path, datetime) pairs for the files to update
+        chunk_size: Maximum number of paths per SetFile call
+    """
+    if sys.platform != "darwin":
+        return
+    
+    import subprocess
+    
+    paths_by_date: Dict[str, List[str]] = defaultdict(list)
+    for file_path, date_time in files:
+        paths_by_date[date_time.strftime("%m/%d/%Y %H:%M:%S")].append(str(file_path))
+    
+    try:
+        for date_str, paths in paths_by_date.items():
+            for i in range(0, len(paths), chunk_size):
+                subprocess.run([
+                    "SetFile", "-d", date_str, "-m", date_str, *paths[i:i + chunk_size]
+                ], check=False, capture_output=True)
+    except (FileNotFoundError, subprocess.SubprocessError):
+        # SetFile not available, skip creation time setting
+        pass
+
+
+# Transpose needed for each EXIF orientation value (index), None if upright
+_ORIENTATION_TRANSPOSE = (
+    None,
+    None,
+    Image.Transpose.FLIP_LEFT_RIGHT,
+    Image.Transpose.ROTATE_180,
+    Image.Transpose.FLIP_TOP_BOTTOM,
+    Image.Transpose.TRANSPOSE,
+    Image.Transpose.ROTATE_270,
+    Image.Transpose.TRANSVERSE,
+    Image.Transpose.ROTATE_90,
+)
 
 
 def apply_exif_orientation(image: Image.Image) -> Image.Image:
     """
     Apply EXIF orientation transformation to rotate image correctly.
     
+    Unlike ImageOps.exif_transpose, upright images are returned as-is rather
+    than copied, and the EXIF/XMP metadata isn't rewritten since it is replaced
+    on save anyway.
+    
     Args:
         image: PIL Image object
         
     Returns:
         Rotated PIL Image object
     """
+    orientation = image.getexif().get(ExifTags.Base.Orientation, 1)
     try:
-        # Get EXIF data
-        exif = image.getexif()
+        transpose = _ORIENTATION_TRANSPOSE[orientation]
+    except (IndexError, TypeError):
+        # Unknown orientation value, leave the image as-is
+        return image
+    
+    return image if transpose is None else image.transpose(transpose)
+
+
+def load_image(source_path: Path, max_dimension: int) -> Image.Image:
+    """
+    Open and fully decode an image, applying its EXIF orientation.
+    
+    Args:
+        source_path: Path to source image
+        max_dimension: Maximum dimension the image will be resized to
         
-        # Get orientation tag (274 is the EXIF tag for Orientation)
-        orientation = exif.get(274, 1)
+    Returns:
+        Decoded PIL Image object
+    """
+    with Image.open(source_path) as img:
+        # Let libjpeg downscale during decode; resize_image finishes the job
+        if img.format in ('JPEG', 'MPO'):
+            width, height = img.size
+            scale = max_dimension / max(width, height)
+            if scale < 1:
+                img.draft('RGB', (max(1, int(width * scale)), max(1, int(height * scale))))
         
-        # Apply rotation based on orientation value
-        if orientation == 2:
-            # Horizontal flip
-            image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
-        elif orientation == 3:
-            # 180 degree rotation
-            image = image.rotate(180, expand=True)
-        elif orientation == 4:
-            # Vertical flip
-            image = image.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
-        elif orientation == 5:
-            # Horizontal flip + 90 degree rotation
-            image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
-            image = image.rotate(90, expand=True)
-        elif orientation == 6:
-            # 90 degree rotation
-            image = image.rotate(270, expand=True)
-        elif orientation == 7:
-            # Horizontal flip + 270 degree rotation
-            image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
-            image = image.rotate(270, expand=True)
-        elif orientation == 8:
-            # 270 degree rotation
-            image = image.rotate(90, expand=True)
-        # orientation == 1 or any other value: no transformation needed
+        # Decode now so the file can be closed
+        img.load()
         
-    except (AttributeError, KeyError, TypeError):
-        # No EXIF data or orientation tag, return image as-is
-        pass
-    
-    return image
+        # Apply EXIF orientation transformation first
+        return apply_exif_orientation(img)
 
 
-def process_image(source_path: Path, dest_path: Path, max_dimension: int, quality: int) -> bool:
+def process_image(source_path: Path, dest_path: Path, date_taken: datetime, max_dimension: int,
+                  quality: int, optimize: bool = False, progressive: bool = False,
+                  decoded: Optional[Future] = None) -> bool:
     """
     Process a single image file.
     
     Args:
         source_path: Path to source image
         dest_path: Path to destination image
+        date_taken: Date parsed from the source filename
         max_dimension: Maximum dimension for resizing
         quality: JPEG quality (1-100)
+        optimize: Compute optimal Huffman tables (slower encode, smaller file)
+        progressive: Write a progressive JPEG instead of baseline
+        decoded: Future for a load_image call already in progress, if any
         
     Returns:
         True if processed successfully, False otherwise
     """
     try:
-        # Parse date from filename
-        date_from_filename = parse_date_from_filename(source_path.name)
-        if not date_from_filename:
-            print(f"No valid date found in filename: {source_path.name}")
-            return False
+        if decoded is not None:
+            img = decoded.result()
+        else:
+            img = load_image(source_path, max_dimension)
         
-        # Open and process image
-        with Image.open(source_path) as img:
-            # Apply EXIF orientation transformation first
-            img = apply_exif_orientation(img)
-            
-            # Convert to RGB if necessary (for PNG with transparency)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # Create white background for transparent images
+        # Palette images with transparency are resized as RGBA so it survives
+        if img.mode == 'P':
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        elif img.mode not in ('RGB', 'RGBA', 'LA'):
+            img = img.convert('RGB')
+        
+        # Resize image if needed, before compositing so the blend runs on fewer pixels
+        img = resize_image(img, max_dimension)
+        
+        # Composite transparent images onto a white background
+        if img.mode in ('RGBA', 'LA'):
+            alpha = img.getchannel('A')
+            if alpha.getextrema()[0] == 255:
+                # Fully opaque, so just drop the alpha channel
+                img = img.convert('RGB')
+            else:
                 background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+                background.paste(img, mask=alpha)
                 img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Resize image if needed
-            img = resize_image(img, max_dimension)
-            
-            # Create destination directory if it doesn't exist
-            dest_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Create EXIF data with date
-            exif_bytes = create_exif_with_date(date_from_filename)
-            
-            # Save as JPEG with EXIF data
-            img.save(dest_path, 'JPEG', quality=quality, exif=exif_bytes)
         
-        # Set file timestamps
-        set_file_timestamps(dest_path, date_from_filename)
+        # Create destination directory if it doesn't exist
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Create EXIF data with date
+        exif_bytes = create_exif_with_date(date_taken)
         
-        print(f"Processed: {source_path.name} -> {dest_path.name} (date: {date_from_filename.strftime('%Y-%m-%d')})")
+        # Encode JPEG with EXIF data in memory, then write it out in one go
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=quality, exif=exif_bytes, subsampling=2,
+                 optimize=optimize, progressive=progressive)
+        dest_path.write_bytes(buffer.getbuffer())
+        
+        print(f"Processed: {source_path.name} -> {dest_path.name} (date: {date_taken.strftime('%Y-%m-%d')})")
         return True
         
     except Exception as e:
@@ -265,6 +375,72 @@ def process_image(source_path: Path, dest_path: Path, max_dimension: int, qualit
         return False
 
 
+def process_batch(jobs: List[Tuple[Path, Path, datetime]], max_dimension: int, quality: int,
+                  optimize: bool = False, progressive: bool = False) -> List[bool]:
+    """
+    Process a batch of image files, decoding the next image while the current
+    one is resized and encoded.
+    
+    Pillow releases the GIL while decoding, resizing and encoding, so the
+    decode thread genuinely overlaps with the caller's work. Only one image is
+    decoded ahead to bound memory use.
+    
+    Args:
+        jobs: (source path, destination path, date) for each image
+        max_dimension: Maximum dimension for resizing
+        quality: JPEG quality (1-100)
+        optimize: Compute optimal Huffman tables (slower encode, smaller file)
+        progressive: Write a progressive JPEG instead of baseline
+        
+    Returns:
+        Whether each image was processed successfully, in the order of jobs
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=1) as decoder:
+        if jobs:
+            next_decoded = decoder.submit(load_image, jobs[0][0], max_dimension)
+        for i, (source_path, dest_path, date_taken) in enumerate(jobs):
+            decoded = next_decoded
+            if i + 1 < len(jobs):
+                next_decoded = decoder.submit(load_image, jobs[i + 1][0], max_dimension)
+            
+            results.append(process_image(source_path, dest_path, date_taken, max_dimension,
+                                         quality, optimize, progressive, decoded))
+    
+    return results
+
+
+def _worker_init():
+    """
+    One-time setup for each worker process, so the first image a worker
+    handles doesn't pay for it.
+    
+    The EXIF template and date regex are built when the module is imported;
+    Pillow's JPEG and PNG plugins would otherwise be imported lazily on the
+    first Image.open.
+    """
+    Image.preinit()
+
+
+def positive_int(value: str) -> int:
+    """
+    Argparse type for options that must be a positive integer.
+    
+    Args:
+        value: The command line value
+        
+    Returns:
+        The value as an int
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: '{value}'")
+    return number
+
+
 def main():
     """Main function to handle command line arguments and process images."""
     parser = argparse.ArgumentParser(
@@ -288,6 +464,17 @@ Supported filename date formats:
     parser.add_argument('max_dimension', type=int, help='Maximum width/height in pixels')
     parser.add_argument('quality', type=int, choices=range(1, 101), metavar='1-100',
                        help='JPEG quality (1-100)')
+    parser.add_argument('--optimize', action='store_true',
+                       help='Optimize JPEG Huffman tables (smaller files, slower encoding)')
+    parser.add_argument('--progressive', action='store_true',
+                       help='Write progressive JPEGs instead of baseline')
+    parser.add_argument('--force', action='store_true',
+                       help='Reprocess images even if the destination is already up to date')
+    parser.add_argument('--jobs', type=positive_int, default=None,
+                       help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--io-jobs', type=positive_int, default=None,
+                       help='Use this many worker threads instead of processes '
+                            '(useful when reading from slow or network-mounted sources)')
     
     args = parser.parse_args()
     
@@ -304,13 +491,14 @@ Supported filename date formats:
         print(f"Error: Source path is not a directory: {source_dir}")
         sys.exit(1)
     
-    # Find all PNG and JPG files
+    # Find all PNG and JPG files in a single traversal, matching extensions case-insensitively
     image_extensions = {'.png', '.jpg', '.jpeg'}
-    image_files = []
-    
-    for ext in image_extensions:
-        image_files.extend(source_dir.rglob(f'*{ext}'))
-        image_files.extend(source_dir.rglob(f'*{ext.upper()}'))
+    image_files = [
+        Path(dirpath) / filename
+        for dirpath, _, filenames in os.walk(source_dir)
+        for filename in filenames
+        if os.path.splitext(filename)[1].lower() in image_extensions
+    ]
     
     if not image_files:
         print(f"No PNG or JPG files found in: {source_dir}")
@@ -318,19 +506,78 @@ Supported filename date formats:
     
     print(f"Found {len(image_files)} image files")
     
-    # Process each image
-    processed_count = 0
+    jobs = []
+    skipped_count = 0
     for source_file in image_files:
-        # Calculate relative path from source directory
-        relative_path = source_file.relative_to(source_dir)
+        # Parse date from filename
+        date_from_filename = parse_date_from_filename(source_file.name)
+        if not date_from_filename:
+            print(f"No valid date found in filename: {source_file.name}")
+            continue
+        
+        # Mirror the relative path from the source directory, with a .jpg extension
+        relative_path = os.path.relpath(source_file, source_dir)
+        dest_file = Path(dest_dir, os.path.splitext(relative_path)[0] + '.jpg')
         
-        # Create destination path with .jpg extension
-        dest_file = dest_dir / relative_path.with_suffix('.jpg')
+        # Skip images already processed by a previous run (their mtime is set to the filename date)
+        if not args.force:
+            try:
+                if dest_file.stat().st_mtime_ns == timestamp_ns(date_from_filename):
+                    skipped_count += 1
+                    continue
+            except OSError:
+                # Missing or unreadable destination, so process the image
+                pass
         
-        if process_image(source_file, dest_file, args.max_dimension, args.quality):
-            processed_count += 1
+        jobs.append((source_file, dest_file, date_from_filename))
+    
+    # Process each directory's files consecutively, in a stable order, for directory cache locality
+    jobs.sort(key=lambda job: (job[0].parent, job[0].name))
+    
+    # Images are independent, so process them in parallel
+    if args.io_jobs:
+        workers = args.io_jobs
+        executor = ThreadPoolExecutor(max_workers=workers)
+    else:
+        workers = args.jobs or os.cpu_count() or 1
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_worker_init)
+    
+    # Hand out work in batches so each worker can pipeline decoding with encoding,
+    # while keeping batches small enough to balance load across workers
+    batch_size = max(1, min(32, len(jobs) // (workers * 4)))
+    
+    processed_files = []
+    with executor as ex:
+        futures = {}
+        for i in range(0, len(jobs), batch_size):
+            batch = jobs[i:i + batch_size]
+            future = ex.submit(process_batch, batch, args.max_dimension, args.quality,
+                               args.optimize, args.progressive)
+            futures[future] = batch
+        
+        # Set file timestamps as each batch finishes, overlapping with the remaining work;
+        # batches hold files grouped by directory so updates to a directory stay together
+        for future in as_completed(futures):
+            written = [(source_file, dest_file, date_taken)
+                       for (source_file, dest_file, date_taken), success
+                       in zip(futures[future], future.result()) if success]
+            
+            # On macOS, set creation times with one SetFile call per date in the batch.
+            # This runs before utime because the mtime marks a file as up to date, so
+            # an interrupted run can't leave files skipped without their creation time.
+            set_creation_times([(dest_file, date_taken) for _, dest_file, date_taken in written])
+            
+            for source_file, dest_file, date_taken in written:
+                try:
+                    set_file_timestamps(dest_file, date_taken)
+                except OSError as e:
+                    print(f"Error processing {source_file.name}: {e}")
+                    continue
+                processed_files.append((dest_file, date_taken))
     
-    print(f"\nProcessed {processed_count} out of {len(image_files)} images")
+    print(f"\nProcessed {len(processed_files)} out of {len(image_files)} images")
+    if skipped_count:
+        print(f"Skipped {skipped_count} images that are already up to date (use --force to reprocess)")
 
 
 if __name__ == '__main__':